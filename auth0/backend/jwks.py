@@ -0,0 +1,83 @@
+import json
+import logging
+import threading
+import time
+from urllib.request import urlopen
+
+from jose import jwk
+
+# Sdílený modul z adresáře shared/ v kořeni repozitáře, musí být na PYTHONPATH
+from keytable import KeyTable
+
+logger = logging.getLogger(__name__)
+
+# Veřejné klíče Auth0 tenantu
+# JWKS se nestahuje při každém požadavku, klíče se sestaví jednou a vyhledávají se přes (issuer, kid, alg)
+
+
+class JWKSStore:
+    """Drží aktuální `KeyTable` pro jeden issuer a vyměňuje ji při obnově JWKS.
+
+    Čtení je bez zámku, zámek serializuje pouze stahování JWKS.
+    """
+
+    def __init__(self, issuer, jwks_url, default_alg="RS256", ttl=600, min_refresh_interval=10, timeout=5):
+        self.issuer = issuer
+        self.jwks_url = jwks_url
+        self.default_alg = default_alg
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        # Stahuje se pod zámkem, bez timeoutu by nedostupné Auth0 zablokovalo všechna další načtení
+        self.timeout = timeout
+        self._attempted_at = 0.0
+        self._table = None
+        self._lock = threading.Lock()
+
+    def get_key(self, kid, alg):
+        """Vrátí sestavený klíč, nebo None, pokud jej JWKS neobsahuje."""
+        table = self._table
+        now = time.monotonic()
+        if table is None:
+            table = self.refresh()
+        elif now - table.created_at > self.ttl and now - self._attempted_at > self.min_refresh_interval:
+            # Prošlou tabulku obnoví jediné vlákno, ostatní zatím čtou tu stávající
+            if self._lock.acquire(blocking=False):
+                try:
+                    table = self._install()
+                except (OSError, ValueError, KeyError) as e:
+                    # Auth0 je nedostupné, stávající klíče zůstávají v platnosti
+                    logger.warning("JWKS refresh failed, keeping current keys: %s", e)
+                finally:
+                    self._lock.release()
+
+        key = table.get(self.issuer, kid, alg)
+        last_attempt = max(table.created_at, self._attempted_at)
+        if key is None and time.monotonic() - last_attempt > self.min_refresh_interval:
+            # Neznámý kid, Auth0 mohl klíče rotovat
+            key = self.refresh().get(self.issuer, kid, alg)
+        return key
+
+    def refresh(self):
+        requested_at = time.monotonic()
+        with self._lock:
+            table = self._table
+            if table is not None and table.created_at >= requested_at:
+                return table
+            return self._install()
+
+    def _install(self):
+        self._attempted_at = time.monotonic()
+        jwks = json.loads(urlopen(self.jwks_url, timeout=self.timeout).read())
+        keys = {}
+        for key in jwks["keys"]:
+            if key.get("use", "sig") != "sig" or "kid" not in key:
+                continue
+            alg = key.get("alg", self.default_alg)
+            try:
+                keys[(self.issuer, key["kid"], alg)] = jwk.construct(key, alg)
+            except Exception:
+                # Nepodporovaný klíč (např. EdDSA) přeskočíme, ostatní zůstanou použitelné
+                continue
+        table = KeyTable(keys)
+        self._table = table
+        return table
@@ -5,10 +5,10 @@ from urllib.parse import quote_plus, urlencode
 from authlib.integrations.flask_client import OAuth
 from flask import Flask, redirect, render_template, session, url_for, request, jsonify, g
 from flask_cors import cross_origin
-from urllib.request import urlopen
 from functools import wraps
 from jose import jwt
 from flasgger import Swagger
+from jwks import JWKSStore
 
 # Kód převzat a upraven do vlastní podoby z: https://auth0.com/docs/quickstart/backend/python
 # Obohacen o Swagger UI na endpointu /apidocs
@@ -24,6 +24,13 @@ AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
 API_AUDIENCE = os.getenv("AUTH0_AUDIENCE")
 ALGORITHMS = ["RS256"]
 
+# Veřejné klíče tenantu, sestavené jednou a sdílené mezi požadavky
+jwks_store = JWKSStore(
+    issuer=f"https://{AUTH0_DOMAIN}/",
+    jwks_url=f"https://{AUTH0_DOMAIN}/.well-known/jwks.json",
+    default_alg=ALGORITHMS[0]
+)
+
 app = Flask(__name__)
 app.secret_key = os.getenv("APP_SECRET_KEY")
 
@@ -88,20 +95,9 @@ def requires_auth(f):
     def decorated(*args, **kwargs):
         token = get_token_auth_header()
         try:
-            jsonurl = urlopen(f"https://{AUTH0_DOMAIN}/.well-known/jwks.json")
-            jwks = json.loads(jsonurl.read())
             unverified_header = jwt.get_unverified_header(token)
-            rsa_key = {}
-            for key in jwks["keys"]:
-                if key["kid"] == unverified_header["kid"]:
-                    rsa_key = {
-                        "kty": key["kty"],
-                        "kid": key["kid"],
-                        "use": key["use"],
-                        "n": key["n"],
-                        "e": key["e"]
-                    }
-            if not rsa_key:
+            rsa_key = jwks_store.get_key(unverified_header["kid"], unverified_header.get("alg"))
+            if rsa_key is None:
                 raise AuthError({"code": "invalid_header",
                                 "description": "Unable to find appropriate key"}, 401)
             payload = jwt.decode(
@@ -0,0 +1,75 @@
+import json
+import unittest
+from unittest import mock
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk
+
+import jwks
+from jwks import JWKSStore
+
+ISSUER = "https://tenant.eu.auth0.com/"
+
+
+def make_jwk(kid):
+    pem = rsa.generate_private_key(65537, 2048).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    key = jwk.construct(pem, "RS256").public_key().to_dict()
+    key.update(kid=kid, use="sig")
+    return key
+
+
+class FakeJWKS:
+    """Stands in for urlopen(), serves `keys` or raises `error`."""
+
+    def __init__(self, *keys):
+        self.keys = list(keys)
+        self.error = None
+        self.calls = 0
+        self.timeouts = []
+
+    def __call__(self, url, timeout=None):
+        self.calls += 1
+        self.timeouts.append(timeout)
+        if self.error:
+            raise self.error
+        response = mock.Mock()
+        response.read.return_value = json.dumps({"keys": self.keys}).encode()
+        return response
+
+
+class TestJWKSStore(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeJWKS(make_jwk("k1"))
+        patcher = mock.patch.object(jwks, "urlopen", self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = JWKSStore(ISSUER, f"{ISSUER}.well-known/jwks.json", min_refresh_interval=0, timeout=3)
+
+    def test_lookup(self):
+        key = self.store.get_key("k1", "RS256")
+        self.assertIsNotNone(key)
+        self.assertIs(self.store.get_key("k1", "RS256"), key)
+        self.assertEqual((self.fake.calls, self.fake.timeouts), (1, [3]))
+
+    def test_unsupported_keys_are_skipped(self):
+        self.fake.keys += [
+            {"kty": "OKP", "crv": "Ed25519", "kid": "ed", "alg": "EdDSA", "x": "11qYAYKxCrfVS_7TyWQHOg7hcvPapiMlrwIaaPcHURo"},
+            {k: v for k, v in make_jwk("no-kid").items() if k != "kid"},
+        ]
+        self.assertIsNotNone(self.store.get_key("k1", "RS256"))
+        self.assertEqual(len(self.store._table), 1)
+
+    def test_failed_stale_refresh_keeps_current_table(self):
+        self.store.ttl = 0
+        table = self.store.refresh()
+        # urlopen hlásí vypršení timeoutu jako OSError
+        self.fake.error = TimeoutError("timed out")
+        self.assertIsNotNone(self.store.get_key("k1", "RS256"))
+        self.assertIs(self.store._table, table)
+
+
+if __name__ == '__main__':
+    unittest.main()
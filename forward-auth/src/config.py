@@ -0,0 +1,38 @@
+import os
+
+
+def env_list(name):
+    return [value.strip() for value in os.getenv(name, "").split(",") if value.strip()]
+
+
+# Auth0 (JWT), poskytovatel je aktivní, pokud je nastavena doména
+AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
+AUTH0_AUDIENCE = os.getenv("AUTH0_AUDIENCE")
+
+# Keycloak (JWT), jeden poskytovatel pro každou kombinaci adresy v `iss` a realmu
+KEYCLOAK_SERVER_URL = os.getenv("KEYCLOAK_SERVER_URL")
+KEYCLOAK_EXTERNAL_URL = os.getenv("KEYCLOAK_EXTERNAL_URL", "http://localhost:8080")
+KEYCLOAK_REALMS = env_list("KEYCLOAK_REALMS")
+KEYCLOAK_CLIENT_ID = os.getenv("KEYCLOAK_CLIENT_ID", "fastapi-app")
+# Token musí být vydán některému z těchto klientů (claim `azp`), výchozí je KEYCLOAK_CLIENT_ID
+KEYCLOAK_AUTHORIZED_PARTIES = env_list("KEYCLOAK_AUTHORIZED_PARTIES") or [KEYCLOAK_CLIENT_ID]
+# Volitelně vyžadovaná hodnota claimu `aud` (vyžaduje audience mapper v Keycloaku)
+KEYCLOAK_AUDIENCE = os.getenv("KEYCLOAK_AUDIENCE")
+
+# Zitadel (JWT i neprůhledné tokeny přes introspekci)
+ZITADEL_DOMAIN = os.getenv("ZITADEL_DOMAIN")
+ZITADEL_CLIENT_ID = os.getenv("ZITADEL_CLIENT_ID")
+ZITADEL_CLIENT_SECRET = os.getenv("ZITADEL_CLIENT_SECRET")
+ZITADEL_PROJECT_ID = os.getenv("ZITADEL_PROJECT_ID")
+
+# Cache rozhodnutí (krátká platnost, odvolání tokenu se projeví nejpozději po této době)
+DECISION_CACHE_TTL = int(os.getenv("DECISION_CACHE_TTL", "30"))
+DECISION_CACHE_SIZE = int(os.getenv("DECISION_CACHE_SIZE", "10000"))
+# JWKS se obnovuje po 10 minutách (600 sekund) nebo při neznámém kid
+JWKS_TTL = int(os.getenv("JWKS_TTL", "600"))
+# Maximální počet souběžných spojení k poskytovatelům identit (na jeden worker)
+MAX_CONNECTIONS = int(os.getenv("MAX_CONNECTIONS", "100"))
+# Maximální počet souběžných introspekcí (na jeden worker), musí být menší než MAX_CONNECTIONS
+MAX_INTROSPECTIONS = int(os.getenv("MAX_INTROSPECTIONS", "32"))
+# Jak dlouho (v sekundách) se pamatuje neplatný neprůhledný token
+INACTIVE_CACHE_TTL = int(os.getenv("INACTIVE_CACHE_TTL", "10"))
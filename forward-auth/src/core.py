@@ -0,0 +1,332 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+from authlib.jose import JsonWebToken
+from authlib.jose.errors import ExpiredTokenError, JoseError
+from cachetools import TTLCache
+
+# Sdílený modul z adresáře shared/ v kořeni repozitáře, musí být na PYTHONPATH
+from keytable import KeyTable, index_jwks
+
+# Ověřování tokenů Auth0, Keycloak a Zitadel pro forward-auth službu
+# Aplikace v auth0/, keycloak/ a zitadel/ mají dál vlastní ověřování, viz README
+
+logger = logging.getLogger(__name__)
+
+# Pouze asymetrické algoritmy, HS* a "none" nejsou pro tokeny poskytovatelů identit přípustné
+ALGORITHMS = ["RS256", "RS384", "RS512", "PS256", "PS384", "PS512", "ES256", "ES384", "ES512", "EdDSA"]
+
+CONTROL_CHARACTERS = re.compile(r"[\x00-\x1f\x7f]")
+# Znaky, které v hodnotě hlavičky zůstanou nezakódované, ostatní (mezera, %, ne-ASCII) se zakódují dle RFC 3986
+HEADER_SAFE = "!#$&'()*+,/:;=?@[]~"
+
+
+class VerificationError(Exception):
+
+    def __init__(self, error: Dict[str, str], status_code: int = 401):
+        super().__init__()
+        self.error = error
+        self.status_code = status_code
+
+
+@dataclass(frozen=True)
+class Provider:
+    """Konfigurace jednoho issuera (Auth0 tenant, Keycloak realm, Zitadel instance)."""
+
+    name: str
+    issuer: str
+    roles: Callable[[dict], FrozenSet[str]]
+    audience: Optional[str] = None
+    # Keycloak: klienti (claim `azp`), kterým smí být token vydán
+    authorized_parties: Tuple[str, ...] = ()
+    discovery_url: Optional[str] = None
+    # Zitadel: introspekce neprůhledných (ne-JWT) tokenů
+    introspection_url: Optional[str] = None
+    client_id: Optional[str] = None
+    client_secret: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def openid_config_url(self):
+        return self.discovery_url or f"{self.issuer.rstrip('/')}/.well-known/openid-configuration"
+
+    def claims_options(self):
+        options = {"iss": {"essential": True, "value": self.issuer}, "exp": {"essential": True}}
+        if self.audience:
+            options["aud"] = {"essential": True, "value": self.audience}
+        if self.authorized_parties:
+            options["azp"] = {"essential": True, "values": list(self.authorized_parties)}
+        return options
+
+
+@dataclass(frozen=True)
+class Identity:
+    """Výsledek ověření tokenu, předává se aplikacím v hlavičkách `X-Auth-*`."""
+
+    provider: str
+    issuer: str
+    subject: str
+    roles: FrozenSet[str]
+    expires_at: int
+    email: Optional[str] = None
+
+    @classmethod
+    def from_claims(cls, provider: Provider, claims: dict):
+        try:
+            email = claims.get("email")
+            identity = cls(
+                provider=provider.name,
+                issuer=provider.issuer,
+                subject=str(claims.get("sub", "")),
+                roles=provider.roles(claims),
+                expires_at=int(claims["exp"]),
+                email=email if isinstance(email, str) else None
+            )
+            values = (identity.subject, identity.email or "", *identity.roles)
+            # Řídicí znaky (včetně CR/LF) v identitě znamenají podvržený nebo poškozený token
+            malformed = any(CONTROL_CHARACTERS.search(value) for value in values)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            # Role nebo expirace jiného typu, než poskytovatel posílá
+            malformed = True
+        if malformed:
+            raise VerificationError({
+                "code": "invalid_token",
+                "description": "Token claims are malformed" })
+        return identity
+
+    def has_scopes(self, clauses: Tuple[FrozenSet[str], ...]):
+        """Alespoň jedna AND-klauzule musí být podmnožinou rolí."""
+        return any(clause <= self.roles for clause in clauses)
+
+    def headers(self):
+        """Hodnoty jsou percent-encoded (UTF-8), role se kódují jednotlivě a oddělují mezerou.
+
+        Hlavičky se posílají vždy, i prázdné, aby proxy přepsala případné hodnoty od klienta.
+        """
+        return {
+            "X-Auth-Provider": quote(self.provider, safe=HEADER_SAFE),
+            "X-Auth-Issuer": quote(self.issuer, safe=HEADER_SAFE),
+            "X-Auth-Subject": quote(self.subject, safe=HEADER_SAFE),
+            "X-Auth-Roles": " ".join(quote(role, safe=HEADER_SAFE) for role in sorted(self.roles)),
+            "X-Auth-Email": quote(self.email or "", safe=HEADER_SAFE),
+            "X-Auth-Expires": str(self.expires_at),
+        }
+
+
+@lru_cache(maxsize=256)
+def compile_scopes(or_scopes: Tuple[str, ...]):
+    """("a b", "c") -> (a AND b) OR c, stejný zápis jako v Zitadel validátoru."""
+    return tuple(frozenset(and_scopes.split()) for and_scopes in or_scopes)
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class KeyRing:
+    """Klíče všech issuerů ve společné `KeyTable`, JWKS se stahuje nejvýše jednou naráz."""
+
+    def __init__(self, http: httpx.AsyncClient, ttl=600, min_refresh_interval=10):
+        self.http = http
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.table = KeyTable()
+        self._loaded_at: Dict[str, float] = {}
+        self._attempted_at: Dict[str, float] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def get_key(self, provider: Provider, kid, alg):
+        key = self.table.get(provider.issuer, kid, alg)
+        loaded_at = self._loaded_at.get(provider.issuer)
+        now = time.monotonic()
+        if loaded_at is None:
+            # Klíče issuera ještě nejsou načtené
+            await self.refresh(provider)
+            key = self.table.get(provider.issuer, kid, alg)
+        elif now - self._attempted_at.get(provider.issuer, 0) > self.min_refresh_interval:
+            if key is None:
+                # Neznámý kid může znamenat rotaci klíčů
+                await self.refresh(provider)
+                key = self.table.get(provider.issuer, kid, alg)
+            elif now - loaded_at > self.ttl and provider.issuer not in self._refreshing:
+                # Prošlé klíče se obnoví na pozadí, požadavek použije stávající tabulku
+                self._refresh_task(provider).add_done_callback(self._log_failure)
+        if key is None:
+            raise VerificationError({
+                "code": "invalid_token",
+                "description": "Unable to find appropriate key" })
+        return key
+
+    async def refresh(self, provider: Provider):
+        try:
+            await asyncio.shield(self._refresh_task(provider))
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            raise VerificationError({
+                "code": "temporarily_unavailable",
+                "description": f"Unable to load keys of {provider.issuer}: {e}" }, 503)
+
+    def _refresh_task(self, provider: Provider):
+        task = self._refreshing.get(provider.issuer)
+        if task is None:
+            self._attempted_at[provider.issuer] = time.monotonic()
+            task = self._refreshing[provider.issuer] = asyncio.create_task(self._load(provider))
+            task.add_done_callback(lambda _: self._refreshing.pop(provider.issuer, None))
+        return task
+
+    async def _load(self, provider: Provider):
+        response = await self.http.get(provider.openid_config_url)
+        response.raise_for_status()
+        response = await self.http.get(response.json()["jwks_uri"])
+        response.raise_for_status()
+        entries = index_jwks(provider.issuer, response.json())
+        # Jedno vlákno event loopu, mezi vytvořením a instalací tabulky není await
+        self.table = self.table.replace(provider.issuer, entries)
+        self._loaded_at[provider.issuer] = time.monotonic()
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Background JWKS refresh failed: %s", task.exception())
+
+
+def _b64_json(segment: str):
+    return json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+
+
+class Verifier:
+    """Ověří token libovolného nakonfigurovaného poskytovatele a vrátí `Identity`.
+
+    JWT se směrují podle claimu `iss`, neprůhledné tokeny jdou na introspekci
+    (Zitadel). Kladná rozhodnutí se drží v krátkodobé cache a souběžná ověření
+    stejného tokenu se slučují do jednoho.
+    """
+
+    def __init__(self, providers, http: httpx.AsyncClient, decision_ttl=30, decision_cache_size=10000,
+                 jwks_ttl=600, leeway=0, max_introspections=32, inactive_ttl=10):
+        self.providers = {provider.issuer: provider for provider in providers}
+        self.introspection = next((p for p in providers if p.introspection_url), None)
+        self.http = http
+        self.keys = KeyRing(http, ttl=jwks_ttl)
+        self.decisions = TTLCache(maxsize=decision_cache_size, ttl=decision_ttl)
+        # Neplatné neprůhledné tokeny (i náhodné řetězce od klientů) se krátce pamatují,
+        # introspekce se neopakuje při každém požadavku
+        self.inactive = TTLCache(maxsize=decision_cache_size, ttl=inactive_ttl)
+        # Počet souběžných introspekcí je omezen, další čekají bez vypršení timeoutu poolu
+        self._introspection_slots = asyncio.Semaphore(max_introspections)
+        self.leeway = leeway
+        self.stats = {"verified": 0, "cached": 0, "coalesced": 0, "rejected": 0, "introspected": 0}
+        self._jwt = JsonWebToken(ALGORITHMS)
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def verify(self, token: str) -> Identity:
+        key = token_key(token)
+        identity = self.decisions.get(key)
+        if identity is not None and identity.expires_at > time.time():
+            self.stats["cached"] += 1
+            return identity
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._verify(key, token))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    async def _verify(self, key: str, token: str) -> Identity:
+        try:
+            if token.count(".") == 2:
+                identity = await self._verify_jwt(token)
+            else:
+                identity = await self._introspect(key, token)
+        except VerificationError:
+            self.stats["rejected"] += 1
+            raise
+        self.stats["verified"] += 1
+        self.decisions[key] = identity
+        return identity
+
+    async def _verify_jwt(self, token: str) -> Identity:
+        try:
+            header_segment, payload_segment, _ = token.split(".")
+            header = _b64_json(header_segment)
+            kid, alg = header.get("kid"), header.get("alg")
+            issuer = _b64_json(payload_segment).get("iss")
+            # Hodnoty slouží jako klíče slovníků, seznam nebo objekt by skončil chybou 500
+            if not isinstance(issuer, str) or not all(isinstance(v, (str, type(None))) for v in (kid, alg)):
+                raise TypeError("iss, kid and alg must be strings")
+        except (ValueError, TypeError, AttributeError):
+            raise VerificationError({
+                "code": "invalid_token",
+                "description": "Unable to parse authentication token." })
+
+        provider = self.providers.get(issuer)
+        if provider is None:
+            raise VerificationError({
+                "code": "invalid_token",
+                "description": "Token issuer is not configured" })
+
+        key = await self.keys.get_key(provider, kid, alg)
+        try:
+            claims = self._jwt.decode(token, key, claims_options=provider.claims_options())
+            claims.validate(leeway=self.leeway)
+        except ExpiredTokenError:
+            raise VerificationError({
+                "code": "token_expired",
+                "description": "Token is expired" })
+        except JoseError as e:
+            raise VerificationError({
+                "code": "invalid_token",
+                "description": f"Invalid token: {e.error}" })
+        except Exception:
+            # Např. algoritmus z hlavičky neodpovídá typu klíče
+            raise VerificationError({
+                "code": "invalid_token",
+                "description": "Unable to verify authentication token." })
+        return Identity.from_claims(provider, claims)
+
+    async def _introspect(self, key: str, token: str) -> Identity:
+        provider = self.introspection
+        if provider is None:
+            raise VerificationError({
+                "code": "invalid_token",
+                "description": "Unable to parse authentication token." })
+        if key in self.inactive:
+            raise VerificationError({
+                "code": "invalid_token",
+                "description": "Invalid token (active: false)" })
+        data = {"token": token, "token_type_hint": "access_token", "scope": "openid"}
+        try:
+            async with self._introspection_slots:
+                self.stats["introspected"] += 1
+                response = await self.http.post(
+                    provider.introspection_url, data=data, auth=(provider.client_id, provider.client_secret))
+            response.raise_for_status()
+            claims = response.json()
+            if not isinstance(claims, dict):
+                raise ValueError("introspection response is not a JSON object")
+        except (httpx.HTTPError, ValueError) as e:
+            raise VerificationError({
+                "code": "temporarily_unavailable",
+                "description": f"Token introspection failed: {e}" }, 503)
+
+        if not claims.get("active"):
+            self.inactive[key] = True
+            raise VerificationError({
+                "code": "invalid_token",
+                "description": "Invalid token (active: false)" })
+        exp = claims.get("exp", 0)
+        if not isinstance(exp, (int, float)) or exp < time.time():
+            raise VerificationError({
+                "code": "invalid_token_expired",
+                "description": "Token has expired." })
+        return Identity.from_claims(provider, claims)
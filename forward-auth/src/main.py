@@ -0,0 +1,100 @@
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import httpx
+from fastapi import FastAPI, Query, Request, Response
+from fastapi.responses import JSONResponse
+
+from config import (
+    DECISION_CACHE_SIZE, DECISION_CACHE_TTL, INACTIVE_CACHE_TTL, JWKS_TTL, MAX_CONNECTIONS, MAX_INTROSPECTIONS
+)
+from core import Verifier, VerificationError, compile_scopes
+from providers import configured_providers
+
+description = """
+## Forward-auth služba pro Auth0, Keycloak a Zitadel
+
+Reverzní proxy (nginx `auth_request`, Traefik `forwardAuth`) volá `/auth` s původní hlavičkou `Authorization`.
+Při úspěchu vrací `200` a ověřenou identitu v hlavičkách `X-Auth-*` (percent-encoded UTF-8), které proxy předá aplikaci.
+Jinak vrací `401` (neplatný token) nebo `403` (chybějící role).
+
+Požadované role lze zadat parametrem `scopes`: každá hodnota je AND-klauzule (role oddělené mezerou),
+více hodnot znamená OR, např. `/auth?scopes=read:messages%20write:messages&scopes=admin`.
+"""
+
+verifier: Optional[Verifier] = None
+
+
+# Každý worker (proces uvicornu) má vlastní HTTP pool, tabulku klíčů a cache rozhodnutí
+@asynccontextmanager
+async def lifespan(app: FastAPI):  # noqa
+    global verifier
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+    async with httpx.AsyncClient(limits=limits, timeout=10.0) as http:
+        verifier = Verifier(
+            configured_providers(),
+            http,
+            decision_ttl=DECISION_CACHE_TTL,
+            decision_cache_size=DECISION_CACHE_SIZE,
+            jwks_ttl=JWKS_TTL,
+            max_introspections=MAX_INTROSPECTIONS,
+            inactive_ttl=INACTIVE_CACHE_TTL
+        )
+        yield
+
+
+app = FastAPI(title="Forward auth", description=description, lifespan=lifespan)
+
+
+@app.exception_handler(VerificationError)
+async def handle_verification_error(request: Request, ex: VerificationError):
+    return JSONResponse(
+        ex.error,
+        status_code=ex.status_code,
+        headers={"WWW-Authenticate": f'Bearer error="{ex.error["code"]}"'}
+    )
+
+
+def bearer_token(auth_header: Optional[str]) -> str:
+    if not auth_header:
+        raise VerificationError({
+            "code": "authorization_header_missing",
+            "description": "Authorization header is expected" })
+    parts = auth_header.split()
+    if not parts or parts[0].lower() != "bearer" or len(parts) != 2:
+        raise VerificationError({
+            "code": "invalid_header",
+            "description": "Authorization header must be Bearer token" })
+    return parts[1]
+
+
+@app.get("/auth")
+async def forward_auth(request: Request, scopes: Optional[List[str]] = Query(None)):
+    """
+    ## Ověření tokenu pro reverzní proxy
+
+    **Popis:** Ověří bearer token a vrátí identitu v hlavičkách `X-Auth-Provider`, `X-Auth-Issuer`,
+    `X-Auth-Subject`, `X-Auth-Roles`, `X-Auth-Email` a `X-Auth-Expires`.
+    """
+    identity = await verifier.verify(bearer_token(request.headers.get("Authorization")))
+    if scopes and not identity.has_scopes(compile_scopes(tuple(scopes))):
+        raise VerificationError({
+            "code": "insufficient_scope",
+            "description": f"Token has insufficient scope. Route requires: {scopes}" }, 403)
+    return Response(status_code=200, headers=identity.headers())
+
+
+@app.get("/stats")
+def stats():
+    """Počítadla ověření a velikosti cache tohoto workeru."""
+    return dict(
+        verifier.stats,
+        decisions_cached=len(verifier.decisions),
+        inactive_cached=len(verifier.inactive),
+        keys=len(verifier.keys.table)
+    )
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
@@ -0,0 +1,65 @@
+from config import (
+    AUTH0_AUDIENCE, AUTH0_DOMAIN,
+    KEYCLOAK_AUDIENCE, KEYCLOAK_AUTHORIZED_PARTIES, KEYCLOAK_CLIENT_ID, KEYCLOAK_EXTERNAL_URL, KEYCLOAK_REALMS,
+    KEYCLOAK_SERVER_URL,
+    ZITADEL_CLIENT_ID, ZITADEL_CLIENT_SECRET, ZITADEL_DOMAIN, ZITADEL_PROJECT_ID
+)
+from core import Provider
+
+# Sestavení poskytovatelů z konfigurace a převod jejich claimů na jednotnou sadu rolí
+
+
+def auth0_roles(claims):
+    """Auth0: `permissions` (RBAC) a `scope`."""
+    return frozenset(claims.get("permissions", [])) | frozenset(claims.get("scope", "").split())
+
+
+def keycloak_roles(client_id):
+    """Keycloak: klientské role, realmové role a skupiny (stejně jako `has_role` / `has_group`)."""
+    def roles(claims):
+        return (
+            frozenset(claims.get("resource_access", {}).get(client_id, {}).get("roles", []))
+            | frozenset(claims.get("realm_access", {}).get("roles", []))
+            | frozenset(claims.get("groups", []))
+        )
+    return roles
+
+
+def zitadel_roles(claims):
+    """Zitadel: klíče `urn:zitadel:iam:org:project:roles` (JWT i odpověď introspekce)."""
+    return frozenset(claims.get("urn:zitadel:iam:org:project:roles", {}))
+
+
+def configured_providers():
+    providers = []
+    if AUTH0_DOMAIN:
+        providers.append(Provider(
+            name="auth0",
+            issuer=f"https://{AUTH0_DOMAIN}/",
+            roles=auth0_roles,
+            audience=AUTH0_AUDIENCE
+        ))
+    if KEYCLOAK_SERVER_URL:
+        # Token může nést interní i externí adresu Keycloaku, klíče se vždy stahují z interní
+        issuer_urls = {KEYCLOAK_SERVER_URL.rstrip("/"), KEYCLOAK_EXTERNAL_URL.rstrip("/")}
+        for realm in KEYCLOAK_REALMS:
+            for url in sorted(issuer_urls):
+                providers.append(Provider(
+                    name="keycloak",
+                    issuer=f"{url}/realms/{realm}",
+                    roles=keycloak_roles(KEYCLOAK_CLIENT_ID),
+                    audience=KEYCLOAK_AUDIENCE,
+                    authorized_parties=tuple(KEYCLOAK_AUTHORIZED_PARTIES),
+                    discovery_url=f"{KEYCLOAK_SERVER_URL.rstrip('/')}/realms/{realm}/.well-known/openid-configuration"
+                ))
+    if ZITADEL_DOMAIN:
+        providers.append(Provider(
+            name="zitadel",
+            issuer=ZITADEL_DOMAIN.rstrip("/"),
+            roles=zitadel_roles,
+            audience=ZITADEL_PROJECT_ID,
+            introspection_url=f"{ZITADEL_DOMAIN.rstrip('/')}/oauth/v2/introspect" if ZITADEL_CLIENT_ID else None,
+            client_id=ZITADEL_CLIENT_ID,
+            client_secret=ZITADEL_CLIENT_SECRET
+        ))
+    return providers
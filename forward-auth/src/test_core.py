@@ -0,0 +1,205 @@
+import asyncio
+import base64
+import json
+import time
+import unittest
+
+import httpx
+from authlib.jose import JsonWebKey, jwt
+
+from core import Identity, Provider, Verifier, VerificationError, compile_scopes
+from main import bearer_token
+from providers import keycloak_roles, zitadel_roles
+
+ISSUER = "http://keycloak:8080/realms/test"
+
+
+def make_key(kid):
+    return JsonWebKey.generate_key("RSA", 2048, is_private=True, options={"kid": kid})
+
+
+class FakeIdP:
+    """OpenID discovery, JWKS and introspection endpoints served by httpx.MockTransport."""
+
+    def __init__(self, *keys):
+        self.keys = list(keys)
+        self.calls = {"jwks": 0, "introspect": 0}
+        self.introspection = {"active": False}
+
+    def handler(self, request):
+        if request.url.path.endswith("openid-configuration"):
+            return httpx.Response(200, json={"issuer": ISSUER, "jwks_uri": f"{ISSUER}/certs"})
+        if request.url.path.endswith("certs"):
+            self.calls["jwks"] += 1
+            keys = [dict(k.as_dict(is_private=False), alg="RS256", use="sig") for k in self.keys]
+            return httpx.Response(200, json={"keys": keys})
+        self.calls["introspect"] += 1
+        if isinstance(self.introspection, str):
+            return httpx.Response(200, text=self.introspection)
+        return httpx.Response(200, json=self.introspection)
+
+
+def sign(key, **claims):
+    payload = {"iss": ISSUER, "sub": "user-1", "exp": int(time.time()) + 300}
+    payload.update(claims)
+    return jwt.encode({"alg": "RS256", "kid": key.kid}, payload, key).decode()
+
+
+def unsigned(header, payload):
+    segments = (base64.urlsafe_b64encode(json.dumps(part).encode()).rstrip(b"=").decode() for part in (header, payload))
+    return ".".join(segments) + ".signature"
+
+
+class TestVerifier(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.key = make_key("k1")
+        self.idp = FakeIdP(self.key)
+        self.http = httpx.AsyncClient(transport=httpx.MockTransport(self.idp.handler))
+        providers = [
+            Provider(name="keycloak", issuer=ISSUER, roles=keycloak_roles("fastapi-app")),
+            Provider(name="zitadel", issuer="http://zitadel", roles=zitadel_roles,
+                     introspection_url="http://zitadel/oauth/v2/introspect", client_id="id", client_secret="secret"),
+        ]
+        self.verifier = Verifier(providers, self.http)
+        self.verifier.keys.min_refresh_interval = 0
+
+    async def asyncTearDown(self):
+        await self.http.aclose()
+
+    async def test_valid_jwt(self):
+        token = sign(self.key, resource_access={"fastapi-app": {"roles": ["user"]}}, groups=["admins"])
+        identity = await self.verifier.verify(token)
+        self.assertEqual(identity.subject, "user-1")
+        self.assertEqual(identity.roles, frozenset({"user", "admins"}))
+        self.assertEqual(identity.headers()["X-Auth-Roles"], "admins user")
+        self.assertTrue(identity.has_scopes(compile_scopes(("user admins",))))
+        self.assertFalse(identity.has_scopes(compile_scopes(("admin",))))
+
+    async def test_unknown_issuer(self):
+        with self.assertRaises(VerificationError) as error:
+            await self.verifier.verify(sign(self.key, iss="http://evil/realms/test"))
+        self.assertEqual(error.exception.error["code"], "invalid_token")
+
+    async def test_expired_token(self):
+        with self.assertRaises(VerificationError) as error:
+            await self.verifier.verify(sign(self.key, exp=int(time.time()) - 10))
+        self.assertEqual(error.exception.error["code"], "token_expired")
+
+    async def test_decision_is_cached_and_concurrent_calls_coalesced(self):
+        token = sign(self.key)
+        await asyncio.gather(*(self.verifier.verify(token) for _ in range(10)))
+        await self.verifier.verify(token)
+        self.assertEqual(self.idp.calls["jwks"], 1)
+        self.assertEqual(self.verifier.stats["verified"], 1)
+        self.assertEqual(self.verifier.stats["coalesced"], 9)
+        self.assertEqual(self.verifier.stats["cached"], 1)
+
+    async def test_rotated_key_triggers_refresh(self):
+        await self.verifier.verify(sign(self.key))
+        rotated = make_key("k2")
+        self.idp.keys.append(rotated)
+        identity = await self.verifier.verify(sign(rotated))
+        self.assertEqual(identity.provider, "keycloak")
+        self.assertEqual(self.idp.calls["jwks"], 2)
+
+    async def test_opaque_token_is_introspected(self):
+        with self.assertRaises(VerificationError):
+            await self.verifier.verify("revoked-token")
+        self.idp.introspection = {
+            "active": True, "sub": "user-2", "exp": int(time.time()) + 300,
+            "urn:zitadel:iam:org:project:roles": {"read:messages": {}},
+        }
+        identity = await self.verifier.verify("opaque-token")
+        self.assertEqual((identity.provider, identity.roles), ("zitadel", frozenset({"read:messages"})))
+
+    async def test_malformed_header_and_issuer_types(self):
+        tokens = [
+            unsigned({"alg": "RS256", "kid": "k1"}, {"iss": [ISSUER]}),
+            unsigned({"alg": "RS256", "kid": {"k": 1}}, {"iss": ISSUER}),
+            unsigned({"alg": ["RS256"], "kid": "k1"}, {"iss": ISSUER}),
+            unsigned(["RS256"], {"iss": ISSUER}),
+        ]
+        for token in tokens:
+            with self.assertRaises(VerificationError) as error:
+                await self.verifier.verify(token)
+            self.assertEqual((error.exception.status_code, error.exception.error["code"]), (401, "invalid_token"))
+
+    async def test_introspection_with_invalid_json_is_unavailable(self):
+        self.idp.introspection = "<html>Bad gateway</html>"
+        with self.assertRaises(VerificationError) as error:
+            await self.verifier.verify("opaque-token")
+        self.assertEqual(error.exception.status_code, 503)
+
+    async def test_control_characters_in_claims_are_rejected(self):
+        for claims in ({"sub": "user-1\r\nX-Auth-Roles: admin"}, {"email": "a@b\n"}, {"groups": ["admins\r"]},
+                       {"groups": [1]}):
+            with self.assertRaises(VerificationError) as error:
+                await self.verifier.verify(sign(self.key, **claims))
+            self.assertEqual(error.exception.error["code"], "invalid_token")
+
+    async def test_inactive_opaque_token_is_cached(self):
+        for _ in range(5):
+            with self.assertRaises(VerificationError):
+                await self.verifier.verify("garbage")
+        self.assertEqual(self.idp.calls["introspect"], 1)
+
+    async def test_introspections_are_capped(self):
+        active = peak = 0
+
+        async def handler(request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.02)
+            active -= 1
+            return httpx.Response(200, json={"active": False})
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            verifier = Verifier([self.verifier.introspection], http, max_introspections=2)
+            results = await asyncio.gather(*(verifier.verify(f"opaque-{i}") for i in range(8)), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, VerificationError) for result in results))
+        self.assertEqual((verifier.stats["introspected"], peak), (8, 2))
+
+    async def test_authorized_party_is_enforced(self):
+        provider = Provider(name="keycloak", issuer=ISSUER, roles=keycloak_roles("fastapi-app"),
+                            authorized_parties=("fastapi-app",))
+        verifier = Verifier([provider], self.http)
+        self.assertEqual((await verifier.verify(sign(self.key, azp="fastapi-app"))).subject, "user-1")
+        for claims in ({"azp": "other-app"}, {}):
+            with self.assertRaises(VerificationError) as error:
+                await verifier.verify(sign(self.key, sub="user-2", **claims))
+            self.assertEqual(error.exception.error["code"], "invalid_token")
+
+
+class TestIdentityHeaders(unittest.TestCase):
+
+    def test_values_are_percent_encoded(self):
+        identity = Identity(provider="keycloak", issuer=ISSUER, subject="Jiří Novák", expires_at=1,
+                            roles=frozenset({"čtenář", "read:messages", "a b"}), email="jiří@example.cz")
+        headers = identity.headers()
+        self.assertEqual(headers["X-Auth-Issuer"], ISSUER)
+        self.assertEqual(headers["X-Auth-Subject"], "Ji%C5%99%C3%AD%20Nov%C3%A1k")
+        self.assertEqual(headers["X-Auth-Roles"], "a%20b read:messages %C4%8Dten%C3%A1%C5%99")
+        self.assertEqual(headers["X-Auth-Email"], "ji%C5%99%C3%AD@example.cz")
+        for value in headers.values():
+            value.encode("ascii")
+
+    def test_all_headers_are_always_sent(self):
+        identity = Identity(provider="zitadel", issuer="http://zitadel", subject="1", roles=frozenset(), expires_at=1)
+        self.assertEqual(set(identity.headers()), {
+            "X-Auth-Provider", "X-Auth-Issuer", "X-Auth-Subject", "X-Auth-Roles", "X-Auth-Email", "X-Auth-Expires"})
+        self.assertEqual(identity.headers()["X-Auth-Email"], "")
+
+
+class TestBearerToken(unittest.TestCase):
+
+    def test_missing_or_malformed_header(self):
+        self.assertEqual(bearer_token("Bearer abc"), "abc")
+        for header in (None, "", "  ", "Bearer", "Basic abc"):
+            with self.assertRaises(VerificationError):
+                bearer_token(header)
+
+
+if __name__ == '__main__':
+    unittest.main()
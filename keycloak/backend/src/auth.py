@@ -2,9 +2,11 @@ from fastapi import Depends, HTTPException, Security
 from fastapi.security import OAuth2AuthorizationCodeBearer
 from authlib.jose import jwt
 from authlib.jose.errors import BadSignatureError, ExpiredTokenError, InvalidClaimError
-import requests
-from config import KEYCLOAK_REALM, KEYCLOAK_EXTERNAL_URL, KEYCLOAK_SERVER_URL
-from cachetools import TTLCache, cached
+from config import (
+    KEYCLOAK_REALM, KEYCLOAK_EXTERNAL_URL, KEYCLOAK_SERVER_URL,
+    KEYCLOAK_ALLOWED_REALMS, KEYCLOAK_MAX_REALMS, KEYCLOAK_REALM_IDLE_TTL
+)
+from keys import RealmKeyStores, UnknownKeyError, UnknownRealmError
 
 # OAuth2 schéma pro FastAPI (Swagger používá `KEYCLOAK_EXTERNAL_URL`)
 oauth2_scheme = OAuth2AuthorizationCodeBearer(
@@ -12,38 +14,33 @@ oauth2_scheme = OAuth2AuthorizationCodeBearer(
     tokenUrl=f"{KEYCLOAK_EXTERNAL_URL}/realms/{KEYCLOAK_REALM}/protocol/openid-connect/token"
 )
 
-# Vytvoření cache pro JWKS s platností 10 minut (600 sekund)
-jwks_cache = TTLCache(maxsize=1, ttl=600)
-
-def get_openid_config():
-    """Dynamicky načte OpenID konfiguraci z Keycloaku."""
-    openid_config_url = f"{KEYCLOAK_SERVER_URL}/realms/{KEYCLOAK_REALM}/.well-known/openid-configuration"
-    try:
-        response = requests.get(openid_config_url)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        raise RuntimeError(f"Nelze načíst OpenID konfiguraci: {e}")
+# Úložiště veřejných klíčů pro jednotlivé realmy, realm se vybírá podle `iss` tokenu
+# Tokeny mohou nést interní (`KEYCLOAK_SERVER_URL`) i externí (`KEYCLOAK_EXTERNAL_URL`) adresu
+# JWKS každého realmu se obnovuje po 10 minutách (600 sekund) nebo při neznámém kid (rotace klíčů)
+realm_key_stores = RealmKeyStores(
+    KEYCLOAK_SERVER_URL,
+    issuer_urls=[KEYCLOAK_SERVER_URL, KEYCLOAK_EXTERNAL_URL],
+    allowed_realms=KEYCLOAK_ALLOWED_REALMS,
+    maxsize=KEYCLOAK_MAX_REALMS,
+    idle_ttl=KEYCLOAK_REALM_IDLE_TTL,
+    ttl=600
+)
 
-@cached(jwks_cache)
-def get_jwks():
-    """Načte JWKS klíče a cacheuje je na 10 minut."""
-    openid_config = get_openid_config()  # OpenID konfigurace se získává dynamicky
-    jwks_uri = openid_config["jwks_uri"]
-    
-    try:
-        response = requests.get(jwks_uri)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        raise RuntimeError(f"Chyba při načítání JWKS: {e}")
+def load_key(header, payload):
+    """Vyhledá předem sestavený klíč podle realmu a hlavičky tokenu."""
+    return realm_key_stores.get_key(payload.get("iss"), header.get("kid"), header.get("alg"))
 
 # Funkce pro ověření a dekódování tokenu
 def verify_token(token: str = Security(oauth2_scheme)):
-    jwks = get_jwks()  # Využití cache
     try:
-        claims = jwt.decode(token, key=jwks, claims_options={"verify_exp": True})
+        claims = jwt.decode(token, key=load_key, claims_options={"verify_exp": True})
         return claims
+    except RuntimeError:
+        raise HTTPException(status_code=503, detail="Nelze načíst klíče pro ověření tokenu")
+    except UnknownRealmError:
+        raise HTTPException(status_code=401, detail="Token nepatří žádnému povolenému realmu")
+    except UnknownKeyError:
+        raise HTTPException(status_code=401, detail="Token je podepsán neznámým klíčem")
     except BadSignatureError:
         raise HTTPException(status_code=401, detail="Neplatný podpis tokenu")
     except ExpiredTokenError:
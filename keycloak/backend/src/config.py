@@ -4,4 +4,9 @@ KEYCLOAK_SERVER_URL = os.getenv("KEYCLOAK_SERVER_URL")
 KEYCLOAK_REALM = os.getenv("KEYCLOAK_REALM")
 KEYCLOAK_CLIENT_ID = os.getenv("KEYCLOAK_CLIENT_ID")
 KEYCLOAK_CLIENT_SECRET = os.getenv("KEYCLOAK_CLIENT_SECRET")
-KEYCLOAK_EXTERNAL_URL = "http://localhost:8080"
\ No newline at end of file
+KEYCLOAK_EXTERNAL_URL = "http://localhost:8080"
+# Více realmů (tenantů) v jednom procesu, realm se určuje podle claimu `iss` v tokenu
+# Výchozí je pouze `KEYCLOAK_REALM`, hodnota "*" povolí libovolný realm na serveru `KEYCLOAK_SERVER_URL`
+KEYCLOAK_ALLOWED_REALMS = [realm.strip() for realm in os.getenv("KEYCLOAK_ALLOWED_REALMS", "").split(",") if realm.strip()] or [KEYCLOAK_REALM]
+KEYCLOAK_MAX_REALMS = int(os.getenv("KEYCLOAK_MAX_REALMS", "256"))
+KEYCLOAK_REALM_IDLE_TTL = int(os.getenv("KEYCLOAK_REALM_IDLE_TTL", "3600"))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Sdílené moduly z adresáře shared/, za běhu je na cestu přidává PYTHONPATH (viz README)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../../shared"))
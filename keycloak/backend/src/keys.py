@@ -0,0 +1,199 @@
+import logging
+import re
+import threading
+import time
+
+import requests
+from cachetools import LRUCache, TTLCache
+
+# Sdílený modul z adresáře shared/ v kořeni repozitáře, musí být na PYTHONPATH
+from keytable import KeyTable, index_jwks
+
+logger = logging.getLogger(__name__)
+
+# Název realmu se vkládá do URL, povolíme jen bezpečné znaky (žádné "..", "?", "#", "/")
+REALM_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]*(\.[A-Za-z0-9_-]+)*")
+
+class UnknownKeyError(Exception):
+    """Token je podepsán klíčem, který v JWKS není k dispozici."""
+
+
+class UnknownRealmError(Exception):
+    """Issuer tokenu neodpovídá žádnému povolenému realmu."""
+
+
+class KeyStore:
+    """Úložiště klíčů jednoho realmu s atomickou výměnou tabulky.
+
+    Čtenáři pouze přečtou referenci na aktuální `KeyTable` a nikdy nečekají
+    na zámek, pokud už nějaká tabulka existuje. Zámek drží jen vlákno, které
+    JWKS obnovuje; ostatní mezitím pracují s předchozí tabulkou.
+    """
+
+    def __init__(self, openid_config_url, ttl=600, min_refresh_interval=10, timeout=5):
+        self.openid_config_url = openid_config_url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        # Stahuje se pod zámkem, bez timeoutu by nedostupný Keycloak zablokoval všechna další načtení
+        self.timeout = timeout
+        self.issuer = None
+        self.last_used = time.monotonic()
+        self._attempted_at = 0.0
+        self._table = None
+        self._lock = threading.Lock()
+
+    @property
+    def table(self):
+        return self._table
+
+    def get_key(self, kid, alg):
+        """Vrátí klíč pro daný `kid` a `alg`, při rotaci klíčů JWKS obnoví."""
+        table = self._table
+        now = time.monotonic()
+        if table is None:
+            table = self.refresh()
+        elif now - table.created_at > self.ttl and now - self._attempted_at > self.min_refresh_interval:
+            # Obnovu provede jen jedno vlákno, ostatní použijí stávající tabulku
+            if self._lock.acquire(blocking=False):
+                try:
+                    table = self._refresh_locked()
+                except RuntimeError as e:
+                    # Výpadek Keycloaku: pokračujeme s dosavadními klíči
+                    logger.warning("Obnova JWKS selhala, používám původní klíče: %s", e)
+                finally:
+                    self._lock.release()
+
+        key = table.get(self.issuer, kid, alg)
+        last_attempt = max(table.created_at, self._attempted_at)
+        if key is None and time.monotonic() - last_attempt > self.min_refresh_interval:
+            # Neznámý kid může znamenat nově rotovaný klíč
+            key = self.refresh().get(self.issuer, kid, alg)
+        if key is None:
+            raise UnknownKeyError(f"Klíč s kid '{kid}' a alg '{alg}' nebyl nalezen")
+        return key
+
+    def refresh(self):
+        """Načte JWKS a nainstaluje novou tabulku klíčů."""
+        requested_at = time.monotonic()
+        with self._lock:
+            table = self._table
+            # Jiné vlákno mezitím tabulku obnovilo, není třeba stahovat znovu
+            if table is not None and table.created_at >= requested_at:
+                return table
+            return self._refresh_locked()
+
+    def _refresh_locked(self):
+        # Čas pokusu omezuje četnost obnov i tehdy, když stahování selhává
+        self._attempted_at = time.monotonic()
+        try:
+            response = requests.get(self.openid_config_url, timeout=self.timeout)
+            if response.status_code == 404:
+                raise UnknownRealmError(f"Realm neexistuje: {self.openid_config_url}")
+            response.raise_for_status()
+            openid_config = response.json()
+            jwks_uri, issuer = openid_config["jwks_uri"], openid_config["issuer"]
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            raise RuntimeError(f"Nelze načíst OpenID konfiguraci: {e}")
+
+        try:
+            response = requests.get(jwks_uri, timeout=self.timeout)
+            response.raise_for_status()
+            jwks = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise RuntimeError(f"Chyba při načítání JWKS: {e}")
+
+        table = KeyTable(index_jwks(issuer, jwks))
+        self.issuer = issuer
+        # Přiřazení reference je atomické, čtenáři vidí buď starou, nebo novou tabulku
+        self._table = table
+        return table
+
+
+class RealmKeyStores:
+    """Úložiště klíčů pro více realmů (tenantů) v jednom procesu.
+
+    `KeyStore` pro realm vzniká až s prvním tokenem daného realmu. Počet
+    realmů drží v mezích LRU cache, realmy bez provozu déle než `idle_ttl`
+    sekund jsou navíc průběžně odstraňovány.
+    """
+
+    def __init__(self, server_url, issuer_urls, allowed_realms, maxsize=256, idle_ttl=3600, ttl=600, failure_ttl=30,
+                 retry_backoff=1):
+        self.server_url = server_url.rstrip("/")
+        self.issuer_prefixes = tuple(f"{url.rstrip('/')}/realms/" for url in issuer_urls)
+        # "*" povolí libovolný realm na serveru, jinak jen vyjmenované realmy
+        self.allowed_realms = frozenset(allowed_realms)
+        self.idle_ttl = idle_ttl
+        self.ttl = ttl
+        self._stores = LRUCache(maxsize=maxsize)
+        # Neexistující realm se pamatuje `failure_ttl` sekund, aby nevyvolal dotaz při každém požadavku.
+        # Přechodná chyba (výpadek sítě, startující Keycloak) jen krátce, `retry_backoff` sekund.
+        self._missing = TTLCache(maxsize=maxsize, ttl=failure_ttl)
+        self._unavailable = TTLCache(maxsize=maxsize, ttl=retry_backoff)
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + idle_ttl
+
+    def realm_from_issuer(self, issuer):
+        """Z claimu `iss` (např. http://localhost:8080/realms/test) vrátí název realmu."""
+        if not isinstance(issuer, str):
+            return None
+        for prefix in self.issuer_prefixes:
+            if issuer.startswith(prefix):
+                realm = issuer[len(prefix):]
+                if REALM_NAME.fullmatch(realm):
+                    return realm
+        return None
+
+    def is_allowed(self, realm):
+        return realm in self.allowed_realms or "*" in self.allowed_realms
+
+    def get_store(self, issuer):
+        realm = self.realm_from_issuer(issuer)
+        if realm is None or not self.is_allowed(realm):
+            raise UnknownRealmError(f"Issuer '{issuer}' nepatří žádnému povolenému realmu")
+
+        now = time.monotonic()
+        with self._lock:
+            # Vždy nová výjimka, opakované vyhození jedné instance by prodlužovalo její traceback
+            if realm in self._missing:
+                raise UnknownRealmError(self._missing[realm])
+            if realm in self._unavailable:
+                raise RuntimeError(self._unavailable[realm])
+            if now >= self._next_sweep:
+                self._evict_idle(now)
+            store = self._stores.get(realm)
+            if store is None:
+                store = KeyStore(
+                    f"{self.server_url}/realms/{realm}/.well-known/openid-configuration",
+                    ttl=self.ttl
+                )
+                self._stores[realm] = store
+            store.last_used = now
+        return realm, store
+
+    def get_key(self, issuer, kid, alg):
+        """Vrátí klíč z úložiště realmu, ke kterému token patří."""
+        realm, store = self.get_store(issuer)
+        try:
+            return store.get_key(kid, alg)
+        except (RuntimeError, UnknownRealmError) as e:
+            # Realm, jehož klíče se nepodařilo načíst ani jednou, v cache nenecháváme
+            if store.table is None:
+                self._discard(realm, store, e)
+            raise
+
+    def _discard(self, realm, store, error):
+        with self._lock:
+            failures = self._missing if isinstance(error, UnknownRealmError) else self._unavailable
+            failures[realm] = str(error)
+            if self._stores.get(realm) is store:
+                del self._stores[realm]
+
+    def _evict_idle(self, now):
+        for realm, store in list(self._stores.items()):
+            if now - store.last_used > self.idle_ttl:
+                del self._stores[realm]
+        self._next_sweep = now + min(self.idle_ttl, 60)
+
+    def __len__(self):
+        return len(self._stores)
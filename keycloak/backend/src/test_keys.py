@@ -0,0 +1,188 @@
+import threading
+import unittest
+from unittest import mock
+
+import requests
+from authlib.jose import JsonWebKey
+
+import keys
+from keys import KeyStore, RealmKeyStores, UnknownKeyError, UnknownRealmError
+
+SERVER_URL = "http://keycloak_server:8080"
+
+
+def make_jwk(kid):
+    key = JsonWebKey.generate_key("RSA", 2048, is_private=True, options={"kid": kid})
+    return dict(key.as_dict(is_private=False), alg="RS256", use="sig")
+
+
+class FakeKeycloak:
+    """Stands in for requests.get(), serves discovery and JWKS of any realm."""
+
+    def __init__(self, *jwks):
+        self.keys = list(jwks)
+        self.error = None
+        self.missing_realms = set()
+        self.calls = []
+        self.timeouts = set()
+
+    def __call__(self, url, timeout=None):
+        self.calls.append(url)
+        self.timeouts.add(timeout)
+        if self.error:
+            raise self.error
+        realm = url.split("/realms/")[1].split("/")[0]
+        response = mock.Mock()
+        response.status_code = 404 if realm in self.missing_realms else 200
+        if response.status_code == 404:
+            response.raise_for_status.side_effect = requests.HTTPError("404 Not Found")
+        if url.endswith("openid-configuration"):
+            response.json.return_value = {
+                "issuer": f"http://localhost:8080/realms/{realm}",
+                "jwks_uri": f"{SERVER_URL}/realms/{realm}/protocol/openid-connect/certs",
+            }
+        else:
+            response.json.return_value = {"keys": self.keys}
+        return response
+
+    @property
+    def jwks_calls(self):
+        return len([url for url in self.calls if url.endswith("certs")])
+
+
+class TestKeyStore(unittest.TestCase):
+
+    def setUp(self):
+        self.keycloak = FakeKeycloak(make_jwk("k1"))
+        patcher = mock.patch.object(keys.requests, "get", self.keycloak)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = KeyStore(f"{SERVER_URL}/realms/test/.well-known/openid-configuration", min_refresh_interval=0,
+                              timeout=3)
+
+    def test_discovery_and_lookup(self):
+        key = self.store.get_key("k1", "RS256")
+        self.assertIs(self.store.get_key("k1", "RS256"), key)
+        # Issuer se bere z discovery (externí adresa), JWKS z interní
+        self.assertEqual(self.store.issuer, "http://localhost:8080/realms/test")
+        self.assertEqual(self.keycloak.jwks_calls, 1)
+        self.assertEqual(self.keycloak.timeouts, {3})
+
+    def test_encryption_keys_are_skipped(self):
+        self.keycloak.keys.append(dict(make_jwk("enc"), use="enc", alg="RSA-OAEP"))
+        self.store.get_key("k1", "RS256")
+        self.assertEqual(len(self.store.table), 1)
+
+    def test_rotation_triggers_refresh(self):
+        self.store.get_key("k1", "RS256")
+        self.keycloak.keys.append(make_jwk("k2"))
+        self.assertIsNotNone(self.store.get_key("k2", "RS256"))
+        self.assertEqual(self.keycloak.jwks_calls, 2)
+
+    def test_unknown_kid_refresh_is_rate_limited(self):
+        self.store.min_refresh_interval = 60
+        self.store.get_key("k1", "RS256")
+        for _ in range(5):
+            with self.assertRaises(UnknownKeyError):
+                self.store.get_key("unknown", "RS256")
+        self.assertEqual(self.keycloak.jwks_calls, 1)
+
+    def test_readers_do_not_wait_for_refresh(self):
+        self.store.ttl = 0
+        old = self.store.refresh()
+        started, release = threading.Event(), threading.Event()
+
+        def slow_get(url, timeout=None):
+            started.set()
+            release.wait(5)
+            return self.keycloak(url, timeout)
+
+        with mock.patch.object(keys.requests, "get", slow_get):
+            refresher = threading.Thread(target=self.store.get_key, args=("k1", "RS256"))
+            refresher.start()
+            started.wait(5)
+            # Obnovující vlákno drží zámek, čtení jde bez čekání do staré tabulky
+            self.assertIs(self.store.table, old)
+            self.assertIsNotNone(self.store.get_key("k1", "RS256"))
+            release.set()
+            refresher.join()
+        self.assertIsNot(self.store.table, old)
+
+
+class TestRealmKeyStores(unittest.TestCase):
+
+    def setUp(self):
+        self.keycloak = FakeKeycloak(make_jwk("k1"))
+        patcher = mock.patch.object(keys.requests, "get", self.keycloak)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.stores = RealmKeyStores(SERVER_URL, [SERVER_URL, "http://localhost:8080"], allowed_realms=["test", "tenant-a"])
+
+    def test_routes_on_issuer(self):
+        self.assertIsNotNone(self.stores.get_key("http://localhost:8080/realms/tenant-a", "k1", "RS256"))
+        self.assertIsNotNone(self.stores.get_key(f"{SERVER_URL}/realms/test", "k1", "RS256"))
+        self.assertEqual(len(self.stores), 2)
+        self.assertTrue(self.keycloak.calls[0].startswith(f"{SERVER_URL}/realms/tenant-a/"))
+
+    def test_realm_outside_allow_list_is_rejected_without_fetch(self):
+        for issuer in ("http://localhost:8080/realms/master", "http://evil/realms/test", ["http://localhost:8080/realms/test"]):
+            with self.assertRaises(UnknownRealmError):
+                self.stores.get_key(issuer, "k1", "RS256")
+        self.assertEqual(self.keycloak.calls, [])
+
+    def test_invalid_realm_names(self):
+        self.stores.allowed_realms = frozenset({"*"})
+        for realm in ("a?x=1#", "..", ".", "a/b", "", "a b", "a%2F.."):
+            self.assertIsNone(self.stores.realm_from_issuer(f"http://localhost:8080/realms/{realm}"), realm)
+        self.assertEqual(self.stores.realm_from_issuer("http://localhost:8080/realms/tenant.a"), "tenant.a")
+
+    def test_missing_realm_is_401_and_cached(self):
+        self.stores.allowed_realms = frozenset({"*"})
+        self.keycloak.missing_realms.add("ghost")
+        for _ in range(5):
+            with self.assertRaises(UnknownRealmError):
+                self.stores.get_key("http://localhost:8080/realms/ghost", "k1", "RS256")
+        self.assertEqual(len(self.keycloak.calls), 1)
+        self.assertEqual(len(self.stores), 0)
+
+    def test_missing_realm_error_is_raised_fresh(self):
+        self.stores.allowed_realms = frozenset({"*"})
+        self.keycloak.missing_realms.add("ghost")
+        errors = []
+        for _ in range(2):
+            with self.assertRaises(UnknownRealmError) as error:
+                self.stores.get_key("http://localhost:8080/realms/ghost", "k1", "RS256")
+            errors.append(error.exception)
+        self.assertIsNot(errors[0], errors[1])
+
+    def test_unreachable_realm_is_retried_after_backoff(self):
+        self.keycloak.error = requests.ConnectionError("Keycloak is down")
+        for _ in range(3):
+            with self.assertRaises(RuntimeError):
+                self.stores.get_key("http://localhost:8080/realms/test", "k1", "RS256")
+        self.assertEqual(len(self.keycloak.calls), 1)
+
+        # Po krátké prodlevě (ne po celém failure_ttl) se realm načte znovu
+        self.stores._unavailable.clear()
+        self.keycloak.error = None
+        self.assertIsNotNone(self.stores.get_key("http://localhost:8080/realms/test", "k1", "RS256"))
+
+    def test_lru_bound(self):
+        stores = RealmKeyStores(SERVER_URL, [SERVER_URL], allowed_realms=["*"], maxsize=2)
+        for realm in ("a", "b", "c"):
+            stores.get_store(f"{SERVER_URL}/realms/{realm}")
+        self.assertEqual(len(stores), 2)
+
+    def test_idle_realms_are_evicted(self):
+        with mock.patch.object(keys.time, "monotonic", return_value=1000.0) as monotonic:
+            stores = RealmKeyStores(SERVER_URL, [SERVER_URL], allowed_realms=["*"], idle_ttl=60)
+            stores.get_store(f"{SERVER_URL}/realms/idle")
+            monotonic.return_value = 1030.0
+            stores.get_store(f"{SERVER_URL}/realms/busy")
+            monotonic.return_value = 1070.0
+            stores.get_store(f"{SERVER_URL}/realms/busy")
+        self.assertEqual(list(stores._stores), ["busy"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import time
+from types import MappingProxyType
+
+# Tabulka veřejných klíčů sdílená Auth0 a Keycloak aplikací a forward-auth službou
+
+
+class KeyTable:
+    """Neměnná tabulka veřejných klíčů indexovaná trojicí (issuer, kid, alg).
+
+    Hodnotami jsou již sestavené klíče (authlib `RSAKey`, `ECKey`, ..., v Auth0
+    aplikaci klíče python-jose), takže vyhledání je jediný přístup do slovníku
+    bez parsování JWK. Tabulka se po vytvoření nemění, při obnově JWKS se
+    sestaví nová a vymění se celá najednou.
+    """
+
+    __slots__ = ("_keys", "created_at")
+
+    def __init__(self, keys=None):
+        self._keys = MappingProxyType(dict(keys or {}))
+        self.created_at = time.monotonic()
+
+    def get(self, issuer, kid, alg):
+        key = self._keys.get((issuer, kid, alg))
+        if key is None:
+            # JWK bez atributu "alg" je uložen pod klíčem s alg=None
+            key = self._keys.get((issuer, kid, None))
+        return key
+
+    def replace(self, issuer, entries):
+        """Nová tabulka, ve které jsou klíče `issuer` nahrazeny položkami `entries`."""
+        keys = {index: key for index, key in self._keys.items() if index[0] != issuer}
+        keys.update(entries)
+        return KeyTable(keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, index):
+        return index in self._keys
+
+
+def index_jwks(issuer, jwks):
+    """Převede JWKS dokument na položky tabulky {(issuer, kid, alg): klíče authlib}."""
+    # authlib potřebují jen uživatelé této funkce, Auth0 aplikace klíče sestavuje přes python-jose
+    from authlib.jose import JsonWebKey
+
+    entries = {}
+    for jwk in jwks.get("keys", []):
+        # Šifrovací klíče (use=enc) k ověření podpisu nepotřebujeme
+        if jwk.get("use", "sig") != "sig" or "kid" not in jwk:
+            continue
+        try:
+            key = JsonWebKey.import_key(jwk)
+        except Exception:
+            # Nepodporovaný typ klíče přeskočíme, ostatní klíče zůstanou použitelné
+            continue
+        entries[(issuer, jwk["kid"], jwk.get("alg"))] = key
+    return entries
@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import weakref
+from functools import wraps
+
+import httpx
+from flask import g, request as flask_request
+
+from scopes import compile_scopes
+from validator import (
+    CLIENT_ID, CLIENT_SECRET, INTROSPECTION_TIMEOUT, MAX_CONCURRENT_INTROSPECTIONS, ZITADEL_DOMAIN,
+    ValidatorError, ZitadelIntrospectTokenValidator, token_key,
+)
+
+# Asynchronní varianta validátoru pro Zitadel introspekci (FastAPI / ASGI i Flask)
+
+
+def bearer_token(auth_header):
+    """Extract the access token from an `Authorization: Bearer <token>` header."""
+    if not auth_header:
+        raise ValidatorError({
+            "code": "authorization_header_missing",
+            "description": "Authorization header is expected" }, 401)
+    parts = auth_header.split()
+    if not parts or parts[0].lower() != "bearer" or len(parts) != 2:
+        raise ValidatorError({
+            "code": "invalid_header",
+            "description": "Authorization header must be Bearer token" }, 401)
+    return parts[1]
+
+
+class _LoopThread:
+    """Long-lived event loop in a daemon thread, shared by sync (Flask) callers."""
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def run(self, coro):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="zitadel-introspection", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+
+class _LoopState:
+    """Connection pool, in-flight calls and concurrency slots of one event loop."""
+
+    __slots__ = ("client", "inflight", "slots")
+
+    def __init__(self, client, max_concurrent):
+        self.client = client
+        self.inflight = {}
+        self.slots = asyncio.Semaphore(max_concurrent)
+
+
+class AsyncZitadelIntrospectTokenValidator:
+    """asyncio-native counterpart of `ZitadelIntrospectTokenValidator`.
+
+    Introspection goes through a pooled `httpx.AsyncClient` (one per event loop),
+    so a waiting request does not hold a worker thread. Scope matching and token
+    validation are the same functions as in the sync validator.
+
+    Concurrent introspections of the same token are coalesced into one request.
+    At most `max_concurrent` requests per event loop are in flight, further callers
+    wait on a semaphore without a deadline instead of timing out on the pool.
+    The cap and the coalescing are separate from the sync validator's: a process
+    using both can have up to twice `MAX_CONCURRENT_INTROSPECTIONS` calls in flight
+    and introspects a token once per validator.
+
+    Only the ASGI integration (`dependency`) is non-blocking. `require_auth` serves
+    Flask, which is synchronous: the view's worker thread still waits for the result.
+    """
+
+    match_token_scopes = ZitadelIntrospectTokenValidator.match_token_scopes
+    validate_token = ZitadelIntrospectTokenValidator.validate_token
+
+    def __init__(self, domain=None, client_id=None, client_secret=None, max_concurrent=None,
+                 timeout=INTROSPECTION_TIMEOUT, transport=None):
+        self.url = f'{domain or ZITADEL_DOMAIN}/oauth/v2/introspect'
+        self.client_id = client_id or CLIENT_ID
+        self.client_secret = client_secret or CLIENT_SECRET
+        self.max_concurrent = max_concurrent or MAX_CONCURRENT_INTROSPECTIONS
+        self.limits = httpx.Limits(max_connections=self.max_concurrent,
+                                   max_keepalive_connections=self.max_concurrent)
+        # The semaphore queues callers, waiting for a pooled connection never times out
+        self.timeout = httpx.Timeout(timeout, pool=None)
+        self.transport = transport
+        self._loops = weakref.WeakKeyDictionary()
+        self._loops_lock = threading.Lock()
+        # Updated on the event loops only, other threads read a copy
+        self.stats = {"issued": 0, "coalesced": 0, "in_flight": 0}
+        self._loop_thread = _LoopThread()
+
+    def _state(self):
+        # httpx.AsyncClient and asyncio.Semaphore are bound to the loop they are used on
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            with self._loops_lock:
+                state = self._loops.get(loop)
+                if state is None:
+                    auth = httpx.BasicAuth(self.client_id, self.client_secret)
+                    client = httpx.AsyncClient(auth=auth, limits=self.limits, timeout=self.timeout,
+                                               transport=self.transport)
+                    state = self._loops[loop] = _LoopState(client, self.max_concurrent)
+        return state
+
+    def introspection_stats(self):
+        """Counters of introspection calls sent to Zitadel and calls served by one already in flight."""
+        return dict(self.stats)
+
+    async def introspect_token(self, token_string):
+        """Single-flight introspection: concurrent requests with the same token share one POST."""
+        state = self._state()
+        key = token_key(token_string)
+        task = state.inflight.get(key)
+        if task is None:
+            self.stats["issued"] += 1
+            self.stats["in_flight"] += 1
+            task = state.inflight[key] = asyncio.get_running_loop().create_task(
+                self._post_introspection(state, token_string))
+            task.add_done_callback(lambda _: self._finished(state, key))
+        else:
+            self.stats["coalesced"] += 1
+        # A cancelled waiter must not cancel the request other waiters depend on
+        return await asyncio.shield(task)
+
+    def _finished(self, state, key):
+        del state.inflight[key]
+        self.stats["in_flight"] -= 1
+
+    async def _post_introspection(self, state, token_string):
+        data = {'token': token_string, 'token_type_hint': 'access_token', 'scope': 'openid'}
+        async with state.slots:
+            resp = await state.client.post(self.url, data=data)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def __call__(self, token_string, scopes=None, request=None):
+        token = await self.introspect_token(token_string)
+        self.validate_token(token, scopes, request)
+        return token
+
+    async def aclose(self):
+        """Close the connection pool of the running event loop."""
+        state = self._loops.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state.client.aclose()
+
+    def dependency(self, scopes=None):
+        """FastAPI dependency, e.g. `Depends(validator.dependency(["read:messages"]))`."""
+        # FastAPI is only needed for this integration, not by the Flask app
+        from fastapi import HTTPException, Request
+
+        scopes = compile_scopes(scopes)
+        async def verify(request: Request):
+            try:
+                token_string = bearer_token(request.headers.get("Authorization"))
+                return await self(token_string, scopes, request)
+            except ValidatorError as ex:
+                raise HTTPException(status_code=ex.status_code, detail=ex.error)
+        return verify
+
+    def require_auth(self, scopes=None):
+        """Flask decorator, the introspection runs on a shared background event loop.
+
+        All worker threads share one connection pool and coalesced introspections,
+        but this is not an async Flask integration: the calling thread blocks until
+        the introspection finishes, exactly like the sync validator. Serving requests
+        without a thread per waiting request needs an ASGI app and `dependency`.
+        """
+        scopes = compile_scopes(scopes)
+        def wrapper(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                token_string = bearer_token(flask_request.headers.get("Authorization"))
+                g.token = self._loop_thread.run(
+                    self(token_string, scopes, flask_request._get_current_object()))
+                return f(*args, **kwargs)
+            return decorated
+        return wrapper
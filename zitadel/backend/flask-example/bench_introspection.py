@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import validator
+from async_validator import AsyncZitadelIntrospectTokenValidator
+
+# Benchmark souběžné introspekce proti lokálnímu stubu Zitadelu s umělou latencí
+# Spuštění: python bench_introspection.py --requests 1000 --concurrency 200 --latency 0.05
+# S přepínačem --same-token nesou všechny požadavky stejný token (ukázka slučování introspekcí)
+
+SCOPES = ["read:messages"]
+
+
+class IntrospectionStub(BaseHTTPRequestHandler):
+    """Answers every introspection request with an active token after `latency` seconds."""
+
+    # HTTP/1.0 (connection per request): the stdlib server stalls on keep-alive under concurrency
+    disable_nagle_algorithm = True
+    latency = 0.05
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        body = json.dumps({
+            "active": True,
+            "exp": int(time.time()) + 3600,
+            "urn:zitadel:iam:org:project:roles": {"read:messages": {"170086305978381234": "example.zitadel.cloud"}},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # listen() backlog, the default of 5 drops connections under a burst
+    request_queue_size = 1024
+
+
+def start_stub(latency):
+    IntrospectionStub.latency = latency
+    server = StubServer(("127.0.0.1", 0), IntrospectionStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def bench_sync(domain, requests, workers, token):
+    validator.ZITADEL_DOMAIN = domain
+    validator.CLIENT_ID, validator.CLIENT_SECRET = "bench", "bench"
+    v = validator.ZitadelIntrospectTokenValidator()
+
+    def one(i):
+        introspected = v.introspect_token(token(i))
+        v.validate_token(introspected, SCOPES, None)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(one, range(requests)))
+    return time.perf_counter() - start, v.introspection_stats()
+
+
+async def bench_async(domain, requests, concurrency, token):
+    v = AsyncZitadelIntrospectTokenValidator(
+        domain=domain, client_id="bench", client_secret="bench", max_concurrent=concurrency)
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with limit:
+            await v(token(i), SCOPES)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    await v.aclose()
+    return elapsed, v.introspection_stats()
+
+
+def report(name, requests, elapsed, stats):
+    print(f"{name:<28} {requests:>6} req  {elapsed:8.2f} s  {requests / elapsed:10.1f} req/s"
+          f"  issued {stats['issued']:>6}  coalesced {stats['coalesced']:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs. async Zitadel introspection throughput")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8, help="threads of the sync (Flask-like) variant")
+    parser.add_argument("--latency", type=float, default=0.05, help="added introspection latency in seconds")
+    parser.add_argument("--same-token", action="store_true", help="all requests carry one hot token")
+    args = parser.parse_args()
+
+    def token(i):
+        return "hot-token" if args.same_token else f"token-{i}"
+
+    server, domain = start_stub(args.latency)
+    try:
+        # validate_token prints every token, keep the benchmark output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync_elapsed, sync_stats = bench_sync(domain, args.requests, args.workers, token)
+            async_elapsed, async_stats = asyncio.run(bench_async(domain, args.requests, args.concurrency, token))
+    finally:
+        server.shutdown()
+
+    print(f"latency {args.latency * 1000:.0f} ms, sync workers {args.workers}, async concurrency {args.concurrency}")
+    report(f"sync ({args.workers} threads)", args.requests, sync_elapsed, sync_stats)
+    report(f"async ({args.concurrency} in flight)", args.requests, async_elapsed, async_stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import timeit
+
+from scopes import compile_scopes
+from validator import ZitadelIntrospectTokenValidator
+
+# Mikrobenchmark párování rolí tokenu s požadavky endpointu (původní vs. předkompilované)
+# Spuštění: python bench_scopes.py --roles 1000 --clauses 200
+
+
+def match_token_scopes_split(token, or_scopes):
+    """Original implementation: splits the route scopes on every request."""
+    if or_scopes is None:
+        return True
+    roles = token["urn:zitadel:iam:org:project:roles"].keys()
+    for and_scopes in or_scopes:
+        scopes = and_scopes.split()
+        if all(key in roles for key in scopes):
+            return True
+    return False
+
+
+def make_case(roles, clauses, clause_size):
+    token = {"urn:zitadel:iam:org:project:roles": {f"role:{i}": {} for i in range(roles)}}
+    # Only the last clause matches, every other clause needs one role the token lacks
+    or_scopes = [
+        " ".join([f"role:{(i * clause_size + j) % roles}" for j in range(clause_size - 1)] + [f"missing:{i}"])
+        for i in range(clauses - 1)
+    ]
+    or_scopes.append(" ".join(f"role:{j}" for j in range(clause_size)))
+    return token, or_scopes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route scope matching microbenchmark")
+    parser.add_argument("--roles", type=int, nargs="+", default=[10, 1000])
+    parser.add_argument("--clauses", type=int, nargs="+", default=[1, 20, 200])
+    parser.add_argument("--clause-size", type=int, default=3)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    v = ZitadelIntrospectTokenValidator()
+    print(f"{'roles':>6} {'clauses':>8} {'split (us)':>12} {'compiled (us)':>14} {'speedup':>8}")
+    for roles in args.roles:
+        for clauses in args.clauses:
+            token, or_scopes = make_case(roles, clauses, args.clause_size)
+            compiled = compile_scopes(or_scopes)
+            assert match_token_scopes_split(token, or_scopes) == v.match_token_scopes(token, compiled) == True
+
+            split = timeit.timeit(lambda: match_token_scopes_split(token, or_scopes), number=args.number)
+            precompiled = timeit.timeit(lambda: v.match_token_scopes(token, compiled), number=args.number)
+            print(f"{roles:>6} {clauses:>8} {split / args.number * 1e6:>12.2f} "
+                  f"{precompiled / args.number * 1e6:>14.2f} {split / precompiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
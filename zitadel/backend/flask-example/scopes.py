@@ -0,0 +1,85 @@
+from functools import lru_cache
+from itertools import product
+
+# Předkompilované požadavky na role (scopes) pro ochranu endpointů
+
+# Route scopes keep the Zitadel quickstart notation: a list of alternatives (OR),
+# each alternative is a space separated list of roles that are all required (AND).
+#   ["read:messages write:messages", "admin"]  ->  (read:messages AND write:messages) OR admin
+# Larger expressions can be composed with AnyOf / AllOf, e.g.
+#   AllOf(AnyOf("read:messages", "admin"), "tenant:acme")
+
+
+class AnyOf:
+    """At least one of the given scope expressions must match (OR)."""
+
+    def __init__(self, *items):
+        self.items = items
+
+
+class AllOf:
+    """All of the given scope expressions must match (AND)."""
+
+    def __init__(self, *items):
+        self.items = items
+
+
+class ScopeExpression:
+    """Scope requirement in disjunctive normal form: an OR of frozenset AND-clauses.
+
+    Matching is a subset test of each clause against the token's role set.
+    """
+
+    __slots__ = ("clauses",)
+
+    def __init__(self, clauses):
+        # A clause that is a superset of another one can never decide the result
+        clauses = set(clauses)
+        self.clauses = tuple(sorted(
+            (c for c in clauses if not any(other < c for other in clauses)),
+            key=len
+        ))
+
+    def matches(self, roles):
+        """`roles` is the token's role set (any set-like object, e.g. a frozenset)."""
+        for clause in self.clauses:
+            if clause <= roles:
+                return True
+        return False
+
+    def __iter__(self):
+        # Back in the route notation, e.g. for error messages
+        return (" ".join(sorted(clause)) for clause in self.clauses)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def _clauses(item):
+    if isinstance(item, str):
+        return [frozenset(item.split())]
+    if isinstance(item, ScopeExpression):
+        return list(item.clauses)
+    if isinstance(item, AllOf):
+        return [frozenset().union(*combination)
+                for combination in product(*(_clauses(i) for i in item.items))]
+    # AnyOf or a plain list / tuple of alternatives
+    items = item.items if isinstance(item, AnyOf) else item
+    return [clause for i in items for clause in _clauses(i)]
+
+
+@lru_cache(maxsize=256)
+def _compile_hashable(or_scopes):
+    return ScopeExpression(_clauses(or_scopes))
+
+
+def compile_scopes(or_scopes):
+    """Parse route scopes once into a `ScopeExpression`, `None` means no scope required."""
+    if or_scopes is None or isinstance(or_scopes, ScopeExpression):
+        return or_scopes
+    if isinstance(or_scopes, str):
+        or_scopes = [or_scopes]
+    if isinstance(or_scopes, (list, tuple)) and all(isinstance(s, str) for s in or_scopes):
+        # Plain lists (e.g. passed at request time) are cached, compiled only once
+        return _compile_hashable(tuple(or_scopes))
+    return ScopeExpression(_clauses(or_scopes))
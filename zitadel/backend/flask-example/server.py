@@ -1,12 +1,18 @@
 from flask import Flask, jsonify, Response
-from authlib.integrations.flask_oauth2 import ResourceProtector
-from validator import ZitadelIntrospectTokenValidator, ValidatorError
+from validator import ZitadelIntrospectTokenValidator, ZitadelResourceProtector, ValidatorError
+from async_validator import AsyncZitadelIntrospectTokenValidator
 
 # Kód a nastavení dle: https://zitadel.com/docs/examples/secure-api/python-flask
 
-require_auth = ResourceProtector()
+require_auth = ZitadelResourceProtector()
 require_auth.register_token_validator(ZitadelIntrospectTokenValidator())
 
+# Introspection through a pooled async client shared by all worker threads,
+# the Flask worker thread still waits for the result.
+# Each validator has its own MAX_CONCURRENT_INTROSPECTIONS cap and coalesces
+# only its own calls, a token used on both kinds of routes is introspected twice
+async_validator = AsyncZitadelIntrospectTokenValidator()
+
 APP = Flask(__name__)
 
 @APP.errorhandler(ValidatorError)
@@ -44,5 +50,15 @@ def private_scoped():
     )
     return jsonify(message=response)
 
+
+@APP.route("/api/private-scoped-async")
+@async_validator.require_auth(["read:messages"])
+def private_scoped_async():
+    """Same as /api/private-scoped, introspection uses the async validator."""
+    response = (
+        "Private, scoped route - You need to be authenticated and have the role read:messages to see this."
+    )
+    return jsonify(message=response)
+
 if __name__ == "__main__":
     APP.run()
\ No newline at end of file
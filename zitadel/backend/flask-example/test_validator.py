@@ -1,6 +1,17 @@
+import asyncio
+import threading
+import time
 import unittest
+from unittest import mock
+
+import httpx
+import requests
+from flask import Flask, g, jsonify
+
+from async_validator import AsyncZitadelIntrospectTokenValidator, bearer_token
 from validator import ZitadelIntrospectTokenValidator as v
 from validator import ValidatorError
+from scopes import AllOf, AnyOf, compile_scopes
 
 # Kód a nastavení dle: https://zitadel.com/docs/examples/secure-api/python-flask
 
@@ -45,5 +56,248 @@ class TestValidatorMatchTokenScopes(unittest.TestCase):
         scopes = ['read:messages', 'write:messages']
         self.assertEqual(v.match_token_scopes(self, token, scopes), True)
 
+class TestCompiledScopes(unittest.TestCase):
+    roles = {'read:messages': {}, 'write:messages': {}}
+
+    def match(self, scopes):
+        return v.match_token_scopes(self, {'urn:zitadel:iam:org:project:roles': self.roles}, scopes)
+
+    def test_compiled_same_as_list(self):
+        for scopes in (['read:messages'], ['admin'], ['read:messages write:messages'], ['read:messages admin', 'write:messages'], []):
+            self.assertEqual(self.match(compile_scopes(scopes)), self.match(scopes))
+
+    def test_nested_expression(self):
+        self.assertEqual(self.match(AllOf(AnyOf('admin', 'read:messages'), 'write:messages')), True)
+        self.assertEqual(self.match(AllOf(AnyOf('admin', 'delete:messages'), 'write:messages')), False)
+        self.assertEqual(self.match(AnyOf(AllOf('admin', 'read:messages'), ['write:messages'])), True)
+
+    def test_redundant_clauses_are_dropped(self):
+        expression = compile_scopes(['read:messages write:messages', 'read:messages'])
+        self.assertEqual(list(expression), ['read:messages'])
+        self.assertEqual(repr(expression), "['read:messages']")
+
+    def test_list_is_compiled_once(self):
+        self.assertIs(compile_scopes(['read:messages']), compile_scopes(['read:messages']))
+
+class TestValidatorIntrospectionCoalescing(unittest.TestCase):
+
+    def run_concurrently(self, post, count=10):
+        results, errors = [], []
+        def call():
+            try:
+                results.append(v().introspect_token('same-token'))
+            except Exception as e:
+                errors.append(e)
+        before = v.introspection_stats()
+        with mock.patch.object(v, '_post_introspection', side_effect=post) as posted:
+            threads = [threading.Thread(target=call) for _ in range(count)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+        after = v.introspection_stats()
+        issued = after['issued'] - before['issued']
+        coalesced = after['coalesced'] - before['coalesced']
+        return posted.call_count, issued, coalesced, results, errors
+
+    def test_same_token_is_introspected_once(self):
+        def post(token_string):
+            time.sleep(0.2)
+            return {'active': True}
+        calls, issued, coalesced, results, errors = self.run_concurrently(post)
+        self.assertEqual(calls, 1)
+        self.assertEqual((issued, coalesced), (1, 9))
+        self.assertEqual(results, [{'active': True}] * 10)
+        self.assertEqual(errors, [])
+        self.assertEqual(v.introspection_stats()['in_flight'], 0)
+
+    def test_error_is_shared_with_waiters(self):
+        def post(token_string):
+            time.sleep(0.2)
+            raise RuntimeError('introspection failed')
+        calls, issued, coalesced, results, errors = self.run_concurrently(post, count=5)
+        self.assertEqual(calls, 1)
+        self.assertEqual(len(errors), 5)
+        self.assertEqual(results, [])
+
+    def test_hung_zitadel_returns_503(self):
+        def post(token_string):
+            time.sleep(0.3)
+            raise requests.Timeout('read timed out')
+        with mock.patch.object(v, 'timeout', 0.1):
+            calls, issued, coalesced, results, errors = self.run_concurrently(post, count=3)
+        # Followers give up after 2 * timeout, the leader when requests times out
+        self.assertEqual(calls, 1)
+        self.assertEqual([e.status_code for e in errors], [503] * 3)
+
+    def test_no_free_slot_returns_503(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with mock.patch.object(v, 'timeout', 0.05), mock.patch.object(v, '_slots', slots):
+            with self.assertRaises(ValidatorError) as error:
+                v().introspect_token('other-token')
+        self.assertEqual(error.exception.error['code'], 'temporarily_unavailable')
+        self.assertEqual(v.introspection_stats()['in_flight'], 0)
+
+    def test_post_has_timeout(self):
+        with mock.patch('validator.requests.post') as post:
+            post.return_value.json.return_value = {'active': True}
+            v().introspect_token('timeout-token')
+        self.assertEqual(post.call_args.kwargs['timeout'], v.timeout)
+
+
+ROLES = 'urn:zitadel:iam:org:project:roles'
+
+
+class FakeZitadel:
+    """Introspection endpoint served by httpx.MockTransport, answers by token."""
+
+    def __init__(self):
+        self.tokens = {}
+        self.calls = 0
+
+    def handler(self, request):
+        self.calls += 1
+        token = dict(item.split('=') for item in request.content.decode().split('&'))['token']
+        return httpx.Response(200, json=self.tokens.get(token, {'active': False}))
+
+    def validator(self):
+        return AsyncZitadelIntrospectTokenValidator(
+            'http://zitadel', 'id', 'secret', transport=httpx.MockTransport(self.handler))
+
+
+def active_token(*roles):
+    return {'active': True, 'exp': int(time.time()) + 300, ROLES: {role: {} for role in roles}}
+
+
+class TestBearerToken(unittest.TestCase):
+
+    def test_valid_header(self):
+        self.assertEqual(bearer_token('Bearer abc'), 'abc')
+        self.assertEqual(bearer_token('bearer abc'), 'abc')
+
+    def test_missing_or_malformed_header(self):
+        for header in (None, '', '   ', 'Bearer', 'Basic abc', 'Bearer a b'):
+            with self.assertRaises(ValidatorError) as error:
+                bearer_token(header)
+            self.assertEqual(error.exception.status_code, 401, header)
+
+
+class TestAsyncValidator(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.zitadel = FakeZitadel()
+        self.validator = self.zitadel.validator()
+
+    async def asyncTearDown(self):
+        await self.validator.aclose()
+
+    async def test_active_token(self):
+        self.zitadel.tokens['t1'] = active_token('read:messages')
+        token = await self.validator('t1', compile_scopes(['read:messages']))
+        self.assertTrue(token['active'])
+
+    async def test_inactive_token(self):
+        with self.assertRaises(ValidatorError) as error:
+            await self.validator('revoked')
+        self.assertEqual(error.exception.error['code'], 'invalid_token')
+
+    async def test_insufficient_scope(self):
+        self.zitadel.tokens['t1'] = active_token('read:messages')
+        with self.assertRaises(ValidatorError) as error:
+            await self.validator('t1', compile_scopes(['write:messages']))
+        self.assertEqual(error.exception.error['code'], 'insufficient_scope')
+
+
+class TestAsyncIntrospectionCoalescing(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+
+        async def handler(request):
+            self.calls.append(request)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            await asyncio.sleep(0.05)
+            self.active -= 1
+            return httpx.Response(200, json=active_token())
+
+        self.validator = AsyncZitadelIntrospectTokenValidator(
+            'http://zitadel', 'id', 'secret', max_concurrent=2, transport=httpx.MockTransport(handler))
+
+    async def asyncTearDown(self):
+        await self.validator.aclose()
+
+    async def test_same_token_is_introspected_once(self):
+        results = await asyncio.gather(*(self.validator.introspect_token('t1') for _ in range(10)))
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results, [results[0]] * 10)
+        self.assertEqual(self.validator.introspection_stats(), {'issued': 1, 'coalesced': 9, 'in_flight': 0})
+
+    async def test_cancelled_waiter_does_not_cancel_shared_call(self):
+        first = asyncio.ensure_future(self.validator.introspect_token('t1'))
+        second = asyncio.ensure_future(self.validator.introspect_token('t1'))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertTrue((await second)['active'])
+        self.assertEqual(len(self.calls), 1)
+
+    async def test_concurrency_is_capped(self):
+        await asyncio.gather(*(self.validator.introspect_token(f't{i}') for i in range(8)))
+        self.assertEqual(len(self.calls), 8)
+        self.assertEqual(self.peak, 2)
+
+    async def test_stats_are_readable_from_another_thread(self):
+        pending = asyncio.gather(*(self.validator.introspect_token(f't{i}') for i in range(4)))
+        await asyncio.sleep(0)
+        stats = await asyncio.to_thread(self.validator.introspection_stats)
+        self.assertEqual(stats['in_flight'], 4)
+        await pending
+
+
+class TestAsyncValidatorFlask(unittest.TestCase):
+
+    def setUp(self):
+        self.zitadel = FakeZitadel()
+        validator = self.zitadel.validator()
+        app = Flask(__name__)
+
+        @app.errorhandler(ValidatorError)
+        def handle_auth_error(ex):
+            return jsonify(ex.error), ex.status_code
+
+        @app.route('/scoped')
+        @validator.require_auth(['read:messages'])
+        def scoped():
+            return jsonify(active=g.token['active'])
+
+        self.client = app.test_client()
+
+    def get(self, authorization=None):
+        headers = {'Authorization': authorization} if authorization is not None else {}
+        return self.client.get('/scoped', headers=headers)
+
+    def test_active_token(self):
+        self.zitadel.tokens['t1'] = active_token('read:messages')
+        response = self.get('Bearer t1')
+        self.assertEqual((response.status_code, response.json), (200, {'active': True}))
+
+    def test_inactive_token(self):
+        response = self.get('Bearer revoked')
+        self.assertEqual((response.status_code, response.json['code']), (401, 'invalid_token'))
+
+    def test_insufficient_scope(self):
+        self.zitadel.tokens['t1'] = active_token('write:messages')
+        response = self.get('Bearer t1')
+        self.assertEqual((response.status_code, response.json['code']), (401, 'insufficient_scope'))
+
+    def test_missing_or_bad_header(self):
+        for header, code in ((None, 'authorization_header_missing'), (' ', 'invalid_header'),
+                             ('Basic abc', 'invalid_header')):
+            response = self.get(header)
+            self.assertEqual((response.status_code, response.json['code']), (401, code), header)
+        self.assertEqual(self.zitadel.calls, 0)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,13 +1,18 @@
 from os import environ as env
+import hashlib
 import os
+import threading
 import time
 from typing import Dict
 
+from authlib.integrations.flask_oauth2 import ResourceProtector
 from authlib.oauth2.rfc7662 import IntrospectTokenValidator
 import requests
 from dotenv import load_dotenv, find_dotenv
 from requests.auth import HTTPBasicAuth
 
+from scopes import compile_scopes
+
 # Kód a nastavení dle: https://zitadel.com/docs/examples/secure-api/python-flask
 
 load_dotenv()
@@ -15,6 +20,11 @@ load_dotenv()
 ZITADEL_DOMAIN = os.getenv("ZITADEL_DOMAIN")
 CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+# Cap on concurrent introspection calls of one validator class, further callers wait in a queue.
+# The sync and the async validator each have their own cap, see README
+MAX_CONCURRENT_INTROSPECTIONS = int(os.getenv("MAX_CONCURRENT_INTROSPECTIONS", "32"))
+# Seconds to wait for Zitadel, and separately for a free introspection slot
+INTROSPECTION_TIMEOUT = float(os.getenv("INTROSPECTION_TIMEOUT", "10"))
 
 
 class ValidatorError(Exception):
@@ -24,28 +34,95 @@ class ValidatorError(Exception):
         self.error = error
         self.status_code = status_code
 
+
+def token_key(token_string: str) -> str:
+    """Key for coalescing introspections of the same token, the raw token is not kept."""
+    return hashlib.sha256(token_string.encode()).hexdigest()
+
+
+class _InflightCall:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
 # Use Introspection in Resource Server
 # https://docs.authlib.org/en/latest/specs/rfc7662.html#require-oauth-introspection
 
 class ZitadelIntrospectTokenValidator(IntrospectTokenValidator):
+    # Shared by all validator instances of the process
+    _inflight: Dict[str, _InflightCall] = {}
+    _inflight_lock = threading.Lock()
+    _slots = threading.BoundedSemaphore(MAX_CONCURRENT_INTROSPECTIONS)
+    stats = {"issued": 0, "coalesced": 0}
+    timeout = INTROSPECTION_TIMEOUT
+
+    @classmethod
+    def introspection_stats(cls):
+        """Counters of introspection calls sent to Zitadel and calls served by one already in flight."""
+        with cls._inflight_lock:
+            return dict(cls.stats, in_flight=len(cls._inflight))
+
     def introspect_token(self, token_string):
+        """Single-flight introspection: concurrent requests with the same token share one POST."""
+        key = token_key(token_string)
+        with self._inflight_lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+                self.stats["issued"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            # The leader waits at most for a slot and for Zitadel, followers no longer
+            if not call.done.wait(2 * self.timeout):
+                raise self._unavailable("Token introspection timed out")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if not self._slots.acquire(timeout=self.timeout):
+                raise self._unavailable("Too many token introspections in progress")
+            try:
+                call.result = self._post_introspection(token_string)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                raise self._unavailable(f"Token introspection failed: {e}")
+            finally:
+                self._slots.release()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            call.done.set()
+        return call.result
+
+    @staticmethod
+    def _unavailable(description):
+        return ValidatorError({
+            "code": "temporarily_unavailable",
+            "description": description }, 503)
+
+    def _post_introspection(self, token_string):
         url = f'{ZITADEL_DOMAIN}/oauth/v2/introspect'
         data = {'token': token_string, 'token_type_hint': 'access_token', 'scope': 'openid'}
         auth = HTTPBasicAuth(CLIENT_ID, CLIENT_SECRET)
-        resp = requests.post(url, data=data, auth=auth)
+        resp = requests.post(url, data=data, auth=auth, timeout=self.timeout)
         resp.raise_for_status()
         return resp.json()
     
     def match_token_scopes(self, token, or_scopes):
         if or_scopes is None: 
             return True
+        # The keys view already is a set, no copy of the token's roles is needed
         roles = token["urn:zitadel:iam:org:project:roles"].keys()
-        for and_scopes in or_scopes:
-            scopes = and_scopes.split()
-            """print(f"Check if all {scopes} are in {roles}")"""
-            if all(key in roles for key in scopes):
-                return True
-        return False
+        return compile_scopes(or_scopes).matches(roles)
 
     def validate_token(self, token, scopes, request):
         print (f"Token: {token}\n")
@@ -72,4 +149,13 @@ class ZitadelIntrospectTokenValidator(IntrospectTokenValidator):
 
     def __call__(self, *args, **kwargs):
         res = self.introspect_token(*args, **kwargs)
-        return res
\ No newline at end of file
+        return res
+
+
+class ZitadelResourceProtector(ResourceProtector):
+    """ResourceProtector that parses route scopes once, when the route is decorated."""
+
+    def __call__(self, scopes=None, optional=False, **kwargs):
+        if not callable(scopes):
+            scopes = compile_scopes(scopes)
+        return super().__call__(scopes, optional, **kwargs)